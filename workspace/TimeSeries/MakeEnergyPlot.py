@@ -2,11 +2,25 @@
 import sys
 import pandas
 import numpy
-import datetime
+import calendar
 import enum
+import types
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import pyarrow
+    import pyarrow.csv as pacsv
+except ImportError:  # read_time_columns falls back to the single-threaded pandas parser
+    pyarrow = None
 
 import ROOT
-from ROOT import TFile, TCanvas, TH1D, THStack, TLegend, TAxis, TColor
+from ROOT import TFile, TCanvas, TH1D, TH1F, THStack, TLegend, TAxis, TColor, TBufferJSON
+
+ROOT.ROOT.EnableThreadSafety()
+# cppyy holds the GIL during C++ calls by default; each worker fills its own histogram, so FillN can run in parallel
+ROOT.TH1D.FillN.__release_gil__ = True
+
+_CANVAS = None  # shared by save_plots, see get_canvas
 
 class TimeMode(enum.Enum):
     UNKNOWN = 0
@@ -25,29 +39,63 @@ class TimeMode(enum.Enum):
         return self.value < other.value
       return NotImplemented
 
-def prepare_df(file_path: str, cols_time: list[str], start_year: int=1825) \
-    -> tuple[pandas.DataFrame, list[str]]:
+# compact dtypes for the known columns of the energy CSV
+CSV_DTYPES = {'Year': numpy.int32, 'Entity': 'category', 'Code': 'category'}
+
+def read_time_columns(file_path: str, cols_time: list[str], start_year: int=1825) -> pandas.DataFrame:
     """
-    Prepare a DataFrame from a CSV file by filtering and summarizing data.
+    Read only the time columns of a CSV file, filtered like prepare_df.
+
+    This cheap first pass gives the time range needed for the bin edges
+    before the full data is streamed. It uses the multi-threaded pyarrow
+    reader when available.
 
-    This function reads a CSV file, filters out entries before a specified year,
+    :param file_path: Path to the CSV file
+    :param cols_time: List of column names representing time data
+    :param start_year: The threshold year for filtering (default is 1825)
+    :return: DataFrame with the time columns only
+    """
+    if pyarrow is None:
+        dtypes = {col: dtype for col, dtype in CSV_DTYPES.items() if col in cols_time}
+        df = pandas.read_csv(file_path, usecols=cols_time, memory_map=True, engine='c', dtype=dtypes)
+    else:
+        # only the time columns are converted, so holding the whole table is cheap
+        read_options = pacsv.ReadOptions(use_threads=True, block_size=8 << 20)
+        convert_options = pacsv.ConvertOptions(
+            column_types={'Year': pyarrow.int32()} if 'Year' in cols_time else {},
+            include_columns=cols_time
+        )
+        df = pacsv.read_csv(file_path, read_options=read_options, convert_options=convert_options).to_pandas()
+    return df[df['Year'] > start_year]
+
+def prepare_df(file_path: str, cols_time: list[str], start_year: int=1825, chunksize: int=200_000) \
+    -> tuple[Iterator[pandas.DataFrame], list[str]]:
+    """
+    Prepare DataFrame chunks from a CSV file by filtering and summarizing data.
+
+    This function streams a CSV file in chunks, filters out entries before a specified year,
     and adds a new column 'Sum(TWh)' which is the sum of all value columns
-    excluding 'Entity', 'Code', and time columns.
+    excluding 'Entity', 'Code', and time columns. Only one chunk is held in memory at a time.
 
     :param file_path: Path to the CSV file
     :param cols_time: List of column names representing time data
     :param start_year: The threshold year for filtering (default is 1825)
-    :return: Tuple of (DataFrame with new sum column, List of value column names including the sum)
+    :param chunksize: Number of CSV rows per chunk
+    :return: Tuple of (Iterator of DataFrame chunks with new sum column, List of value column names including the sum)
     """
     cols_axis = ['Entity', 'Code']
     col_sum = 'Sum(TWh)'
 
-    df = pandas.read_csv(file_path)
-    df = df[df['Year'] > start_year]
-    col_values = numpy.setdiff1d(df.columns, cols_axis + cols_time).tolist()
-    df[col_sum] = df[col_values].sum(axis=1)
-    col_values.append(col_sum)
-    return df, col_values
+    columns = pandas.read_csv(file_path, nrows=0).columns
+    col_values = columns.difference(cols_axis + cols_time, sort=False).tolist()
+
+    def iter_chunks() -> Iterator[pandas.DataFrame]:
+        for df in pandas.read_csv(file_path, chunksize=chunksize, memory_map=True, engine='c', dtype=CSV_DTYPES):
+            df = df[df['Year'] > start_year].copy()
+            df[col_sum] = numpy.nansum(df[col_values].to_numpy(dtype=numpy.float64, copy=False), axis=1)
+            yield df
+
+    return iter_chunks(), col_values + [col_sum]
 
 def generate_bin_edges(df, cols_time, mode=TimeMode.YEAR) -> numpy.ndarray[numpy.double]:
     """
@@ -58,19 +106,18 @@ def generate_bin_edges(df, cols_time, mode=TimeMode.YEAR) -> numpy.ndarray[numpy
     :param mode: Time granularity for bin edges (TimeMode enum)
     :return: Numpy array of bin edges as timestamps
     """
-    df_sorted = df.sort_values(by=cols_time)
-    t_min, t_max = df_sorted.iloc[[0, -1]][cols_time].to_dict('records')
-    ts_min, ts_max = get_timestamp(t_min), get_timestamp(t_max)
     if mode < TimeMode.DAY:
-        res = []
-        for year in range(t_min['Year'], t_max['Year'] + 1):
-            for month in range(1, 13 if mode == TimeMode.MONTH else 2):
-                res.append(get_timestamp({'Year': year, 'Month': month}))
-        res.append(get_timestamp({'Year': t_max['Year'] + 1}))  # Add one year after max year
-    else:
-        inc = TimeMode.increments[mode]
-        res = list(range(int(ts_min), int(ts_max) + inc * 2, inc))
-    return numpy.array(res, dtype=numpy.double)
+        year_min, year_max = int(df['Year'].min()), int(df['Year'].max())
+        months = range(1, 13 if mode == TimeMode.MONTH else 2)
+        res = [calendar.timegm((year, month, 1, 0, 0, 0, 0, 0, 0))
+               for year in range(year_min, year_max + 1) for month in months]
+        res.append(calendar.timegm((year_max + 1, 1, 1, 0, 0, 0, 0, 0, 0)))  # Add one year after max year
+        return numpy.array(res, dtype=numpy.double)
+    # single-pass reductions; column-wise minima of several time columns would not form a valid time
+    ts = vectorize_timestamps(df, cols_time)
+    ts_min, ts_max = ts.min(), ts.max()
+    inc = TimeMode.increments[mode]
+    return numpy.arange(int(ts_min), int(ts_max) + inc * 2, inc, dtype=numpy.double)
 
 def get_timestamp(ts_data: dict[str, int]) -> int:
     """
@@ -79,6 +126,8 @@ def get_timestamp(ts_data: dict[str, int]) -> int:
     This function assumes 'Year' is always present and uses default values
     for missing components, with UTC as the default timezone. If any component
     cannot be converted to an integer, the function will fail.
+    The pipeline does not call it; it is kept as the scalar reference for
+    vectorize_timestamps.
 
     :param ts_data: Dictionary containing date components
     :return: Unix timestamp as an integer
@@ -90,13 +139,44 @@ def get_timestamp(ts_data: dict[str, int]) -> int:
     minute = int(ts_data.get('Minute', 0))
     second = int(ts_data.get('Second', 0))
     zone_off = int(ts_data.get('Zone', 0) * 3600)  # Convert hours to seconds
-    dt = datetime.datetime(
-        year, month, day, hour, minute, second,
-        tzinfo=datetime.timezone(datetime.timedelta(seconds=zone_off))
-    )
-    ts = int(dt.timestamp())
+    ts = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0)) - zone_off
+    return ts
+
+def vectorize_timestamps(df: pandas.DataFrame, cols_time: list[str]) -> numpy.ndarray[numpy.int64]:
+    """
+    Convert the time columns of a DataFrame to Unix timestamps in one vectorized call.
+
+    This is the column-wise counterpart of get_timestamp, with the same defaults
+    for missing components and 'Zone' given as an offset in hours.
+
+    :param df: DataFrame containing time data
+    :param cols_time: List of column names representing time
+    :return: Numpy array of Unix timestamps as int64 seconds
+    """
+    units = {'Year': 'year', 'Month': 'month', 'Day': 'day', 'Hour': 'hour', 'Minute': 'minute', 'Second': 'second'}
+    df_time = df[[col for col in cols_time if col in units]].rename(columns=units)
+    df_time = df_time.assign(**{unit: 1 for unit in ('month', 'day') if unit not in df_time.columns})
+    ts = pandas.to_datetime(df_time).to_numpy(dtype='datetime64[ns]').view('i8') // 10**9
+    if 'Zone' in cols_time:
+        ts -= (df['Zone'].to_numpy(dtype=numpy.float64) * 3600).astype(numpy.int64)
     return ts
 
+def aggregate_by_time(df: pandas.DataFrame, cols_time: list[str], col_values: list[str]) \
+    -> tuple[numpy.ndarray[numpy.int64], pandas.DataFrame]:
+    """
+    Sum the value columns of all rows sharing the same timestamp.
+
+    Each histogram then receives one entry per distinct time (e.g. per year)
+    instead of one per row.
+
+    :param df: DataFrame containing time and value data
+    :param cols_time: List of column names representing time
+    :param col_values: List of value column names to sum
+    :return: Tuple of (sorted Unix timestamps, DataFrame of summed values indexed by timestamp)
+    """
+    agg = df[col_values].groupby(vectorize_timestamps(df, cols_time), sort=True).sum()
+    return agg.index.to_numpy(dtype=numpy.int64), agg
+
 def set_dictcolor() -> dict[str, int]:
     """
     Define a dictionary mapping energy sources to color codes.
@@ -119,45 +199,86 @@ def set_dictcolor() -> dict[str, int]:
         'Otherrenewables': 32
     }
 
-def init_histogram(hname: str, title: str, nbins: int, bin_edges: list[float], dict_color: dict[str, int]) -> TH1D:
+# (line color, fill color, fill style) per histogram name; unknown names are drawn as a line only
+COLOR_SPEC = types.MappingProxyType({hname: (color, color, 1001) for hname, color in set_dictcolor().items()})
+DEFAULT_COLOR_SPEC = (1, 0, 1001)
+
+def init_histogram(hname: str, title: str, nbins: int, bin_edges: numpy.ndarray[numpy.double]) -> TH1D:
     """
     Initialize a TH1D histogram with custom settings for energy consumption data.
 
     This function sets up a histogram with time-based bin edges, custom colors,
     and labels suitable for displaying energy consumption over time.
+    Uniform bin edges are booked as fixed-width bins.
 
-    :param hname: Name of the histogram, used for identification and color mapping
+    :param hname: Name of the histogram, used for identification and color lookup in COLOR_SPEC
     :param title: Title of the histogram
     :param nbins: Number of bins in the histogram
-    :param bin_edges: List of bin edges, typically timestamps for time-based data
-    :param dict_color: Dictionary mapping histogram names to color codes
+    :param bin_edges: C-contiguous double array of bin edges, typically timestamps, passed to TH1D without a copy
     :return: A configured TH1D histogram object
     """
-    hist = TH1D(hname, title, nbins, numpy.array(bin_edges, numpy.double))
+    assert bin_edges.dtype == numpy.double and bin_edges.flags['C_CONTIGUOUS']
+    widths = numpy.diff(bin_edges)
+    if numpy.allclose(widths, widths[0]):
+        # uniform edges: fixed-width bins let FindBin skip the binary search over edges
+        hist = TH1D(hname, title, nbins, bin_edges[0], bin_edges[-1])
+    else:
+        hist = TH1D(hname, title, nbins, bin_edges)
     hist.GetXaxis().SetTimeDisplay(1)
     hist.GetXaxis().SetTimeFormat('%Y')
     hist.GetXaxis().SetTimeOffset(0)
-    color = dict_color.get(hname, 1)
-    hist.SetLineColor(color)
-    hist.SetFillColor(color if color != 1 else 0)
-    hist.SetFillStyle(1001)
+    line_color, fill_color, fill_style = COLOR_SPEC.get(hname, DEFAULT_COLOR_SPEC)
+    hist.SetLineColor(line_color)
+    hist.SetFillColor(fill_color)
+    hist.SetFillStyle(fill_style)
     hist.SetXTitle('Year')
     hist.SetYTitle('Consumed Energy (TWh)')
+    hist.Sumw2()  # book the error array up front, weighted fills would create it anyway
     return hist
 
-def fill_histogram(hist: TH1D, df: pandas.DataFrame, column: str, columns_time: list = ['Year'], dt: float = 0) -> None:
+def fill_histogram(hist: TH1D, xs: numpy.ndarray, values: numpy.ndarray) -> None:
     """
-    Fill a TH1D histogram with data from a DataFrame.
+    Fill a TH1D histogram with timestamps and values in a single FillN call.
 
     :param hist: TH1D histogram to fill
-    :param df: DataFrame containing data
-    :param column: Column name for values
-    :param columns_time: List of column names for time data
-    :param dt: Time offset in seconds
+    :param xs: Array of entry positions (Unix timestamps including any offset), one per entry
+    :param values: Array of values (weights), one per entry
+    """
+    # no copies for contiguous double inputs, so a shared timestamp array is reused as is
+    xs = numpy.ascontiguousarray(xs, dtype=numpy.float64)
+    ws = numpy.ascontiguousarray(values, dtype=numpy.float64)
+    hist.FillN(len(xs), xs, ws)
+
+def to_single_precision(hist: TH1D) -> TH1F:
     """
-    for _, row in df[columns_time + [column]].iterrows():
-        bin_i = hist.Fill(get_timestamp(row[columns_time]) + dt, row[column])
-        hist.SetBinError(bin_i, 0)
+    Copy a TH1D histogram into a detached TH1F with the same binning and style.
+
+    Bin contents are stored as float, which halves the digits written per bin
+    in the JSON output. Bin edges and axis settings stay in double precision.
+
+    :param hist: TH1D histogram to copy
+    :return: A TH1F histogram not attached to any directory
+    """
+    nbins = hist.GetNbinsX()
+    xaxis = hist.GetXaxis()
+    name, title = f"{hist.GetName()}_float", hist.GetTitle()
+    if xaxis.GetXbins().GetSize():
+        hf = TH1F(name, title, nbins, xaxis.GetXbins().GetArray())
+    else:
+        hf = TH1F(name, title, nbins, xaxis.GetXmin(), xaxis.GetXmax())
+    hf.SetDirectory(ROOT.nullptr)
+    hf.SetName(hist.GetName())
+    # contents, Sumw2, entries and statistics in one C++ call
+    hf.Add(hist)
+    # axis settings only after filling: with time display on, writing the overflow bin would inflate the axis
+    xaxis.Copy(hf.GetXaxis())
+    hist.GetYaxis().Copy(hf.GetYaxis())
+    hf.GetXaxis().SetParent(hf)
+    hf.GetYaxis().SetParent(hf)
+    hf.SetLineColor(hist.GetLineColor())
+    hf.SetFillColor(hist.GetFillColor())
+    hf.SetFillStyle(hist.GetFillStyle())
+    return hf
 
 def gen_hstack(dict_h: dict[str, TH1D]) -> tuple[THStack, TLegend]:
     """
@@ -182,20 +303,48 @@ def gen_hstack(dict_h: dict[str, TH1D]) -> tuple[THStack, TLegend]:
     legend.AddEntry(dict_h['Sum'], 'Sum', 'L')
     return hs_energy, legend
 
-def save_plots(outdir: str, dict_h: dict[str, TH1D], hs_energy: THStack, legend: TLegend) -> None:
+def write_text(file_path: str, text: str) -> None:
+    """
+    Write a string to a file, replacing any previous content.
+
+    :param file_path: Path of the output file
+    :param text: Content to write
+    """
+    with open(file_path, 'w') as fw:
+        fw.write(text)
+
+def get_canvas() -> TCanvas:
+    """
+    Return the module-level canvas, creating it on the first call.
+
+    Later calls clear and reuse the same canvas, so the graphics setup is
+    paid only once when plots are saved repeatedly.
+
+    :return: The shared TCanvas, cleared and set as current pad
+    """
+    global _CANVAS
+    if _CANVAS is None:
+        _CANVAS = TCanvas('c_stack', 'canvas stacked energy plot', 1800, 800)
+    else:
+        _CANVAS.Clear()
+    _CANVAS.cd()
+    return _CANVAS
+
+def save_plots(outdir: str, fw: TFile, dict_h: dict[str, TH1D], hs_energy: THStack, legend: TLegend) -> None:
     """
     Save histograms and stacked plot to various file formats.
 
-    This function creates a canvas, draws the stacked histogram, and saves it along with
-    individual histograms in JSON and ROOT formats.
+    This function draws the stacked histogram on the shared canvas, and saves it along with
+    individual histograms in JSON and ROOT formats. The histogram JSON files are
+    written concurrently from single-precision copies; the ROOT file keeps TH1D.
 
     :param outdir: Directory path where files will be saved
+    :param fw: Output ROOT file, opened by the caller
     :param dict_h: Dictionary of histograms to save
     :param hs_energy: THStack object containing stacked histograms
     :param legend: TLegend object for the plot
     """
-    c_stack = TCanvas('c_stack', 'canvas stacked energy plot', 1800, 800)
-    c_stack.cd()
+    c_stack = get_canvas()
     c_stack.SetGridy(1)
     c_stack.SetTopMargin(0.2)
     hs_energy.Draw()
@@ -209,16 +358,18 @@ def save_plots(outdir: str, dict_h: dict[str, TH1D], hs_energy: THStack, legend:
     c_stack.SetLogy()
     c_stack.SaveAs(f"{outdir}/c_stacked_energy.json")
 
-    for hname in dict_h.keys():
-        dict_h[hname].SaveAs(f"{outdir}/h_{hname}.json")
+    # serialize in this thread, the JSROOT viewer loads one file per histogram
+    dict_json = {f"{outdir}/h_{hname}.json": TBufferJSON.ConvertToJSON(to_single_precision(hist)).Data()
+                 for hname, hist in dict_h.items()}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(write_text, dict_json.keys(), dict_json.values()))
 
-    with TFile(f"{outdir}/Energy_Consumption.root", "RECREATE") as fw:
-        fw.cd()
-        for hname in dict_h.keys():
-            dict_h[hname].Write()
-        hs_energy.Write()
-        fw.WriteObject(legend, "legend")
-        c_stack.Write()
+    fw.cd()
+    for hname in dict_h.keys():
+        dict_h[hname].Write()
+    hs_energy.Write()
+    fw.WriteObject(legend, "legend")
+    c_stack.Write()
 
 
 
@@ -236,20 +387,39 @@ def MakeEnergyPlot(args):
     outdir, inpfile = args[1], args[2]
     cols_time = ['Year']
 
-    df, col_values = prepare_df(inpfile, cols_time)
-    bin_edges = generate_bin_edges(df, cols_time)
+    bin_edges = generate_bin_edges(read_time_columns(inpfile, cols_time), cols_time)
+    chunks, col_values = prepare_df(inpfile, cols_time)
 
     dict_h = dict()
     nbins = len(bin_edges) - 1
     dt = 0.05
-    dict_color = set_dictcolor()
-    for ith, icol in enumerate(col_values):
-        hname = icol.replace('(TWh, substituted energy)', '').replace('(TWh)','').replace(' ','')
+    hname_map = {icol: icol.replace('(TWh, substituted energy)', '').replace('(TWh)','').replace(' ','')
+                 for icol in col_values}
+    for icol in col_values:
+        hname = hname_map[icol]
         print('hname=', hname)
-        dict_h[hname] = init_histogram(hname, icol, nbins, bin_edges, dict_color)
-        fill_histogram(dict_h[hname], df, icol, cols_time, dt)
+        dict_h[hname] = init_histogram(hname, icol, nbins, bin_edges)
+    # matrix column indices per histogram, so columns sharing a name fill in the same worker
+    dict_cols = dict()
+    for j, icol in enumerate(col_values):
+        dict_cols.setdefault(hname_map[icol], []).append(j)
+
+    def fill_columns(hname: str, xs: numpy.ndarray, mat: numpy.ndarray) -> None:
+        for j in dict_cols[hname]:
+            fill_histogram(dict_h[hname], xs, mat[:, j])
+
+    with ThreadPoolExecutor(max_workers=min(8, len(col_values))) as executor:
+        for df in chunks:
+            ts, agg = aggregate_by_time(df, cols_time, col_values)
+            xs = ts.astype(numpy.float64) + dt  # shared by all columns of the chunk
+            # column-major copy: each column is a contiguous array, and pandas objects are not shared between threads
+            mat = numpy.asfortranarray(agg[col_values].to_numpy(dtype=numpy.float64))
+            list(executor.map(lambda hname: fill_columns(hname, xs, mat), dict_cols.keys()))
+    for hist in dict_h.values():
+        hist.GetSumw2().Reset()  # no error bars in the plots
     hs_energy, legend = gen_hstack(dict_h)
-    save_plots(outdir, dict_h, hs_energy, legend)
+    with TFile(f"{outdir}/Energy_Consumption.root", "RECREATE") as fw:
+        save_plots(outdir, fw, dict_h, hs_energy, legend)
 
 print('sys.argv =', sys.argv)
 MakeEnergyPlot(sys.argv)